@@ -4,6 +4,20 @@ import subprocess
 import sys
 import time
 import os
+import warnings
+import shelve
+from concurrent.futures import ThreadPoolExecutor
+
+# --- IMPORTANT: SET YOUR API KEY HERE ---
+OPENWEATHERMAP_API_KEY = "YOUR_OPENWEATHERMAP_API_KEY"
+OPENWEATHERMAP_URL = "http://api.openweathermap.org/data/2.5/onecall/timemachine"
+# ----------------------------------------
+
+# Number of concurrent OpenWeatherMap requests (the weather step is network-bound)
+WEATHER_MAX_WORKERS = 32
+
+# On-disk cache of API responses keyed by (lat, lon, day), so reruns skip the network
+WEATHER_CACHE_PATH = '.weather_cache'
 
 # --- IMPORTANT: We only import 'requests' inside the main execution block
 # after the installation function is called, to prevent the crash.
@@ -11,37 +25,36 @@ import os
 # or move the entire function. The safest approach is to move the logic. ---
 
 def install_excel_lib():
-    """Installs the necessary libraries (requests, openpyxl)."""
+    """Installs the necessary libraries (requests, openpyxl, pyarrow, orjson)."""
     # This function is now only called once, at the start of __main__
     try:
         # We need the 'requests' library to make HTTP calls to the API
-        print("Installing required libraries (requests, openpyxl)...")
-        # Install both libraries in one command
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "openpyxl", "requests"])
-        print("\nSuccessfully installed openpyxl and requests.")
+        # 'pyarrow' for the fast CSV reader and 'orjson' to decode the API responses
+        print("Installing required libraries (requests, openpyxl, pyarrow, orjson)...")
+        # Install all libraries in one command
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "openpyxl", "requests", "pyarrow", "orjson"])
+        print("\nSuccessfully installed openpyxl, requests, pyarrow and orjson.")
     except subprocess.CalledProcessError:
-        print("\nFailed to install required libraries. Please install them manually with 'pip install openpyxl requests'.")
+        print("\nFailed to install required libraries. Please install them manually with 'pip install openpyxl requests pyarrow orjson'.")
 
-def get_historical_weather(lat, lon, dt):
+def get_historical_weather(lat, lon, dt, session=None):
     """
     Fetches historical weather data for a specific location and time using the OpenWeatherMap API.
     
-    NOTE: 'requests' must be imported here to use it. We assume successful installation.
+    NOTE: 'requests' and 'orjson' must be imported here to use them. We assume successful installation.
     
     Parameters:
     - lat (float): Latitude of the stadium.
     - lon (float): Longitude of the stadium.
     - dt (int): UNIX timestamp of the match start time.
+    - session (requests.Session, optional): Shared session so concurrent calls reuse
+      keep-alive connections. Falls back to a one-off request if not given.
     
     Returns:
     - dict: Dictionary containing key weather metrics (temp, humidity, wind_speed, dew_point).
     """
     import requests # Local import now possible after successful installation
-    
-    # --- IMPORTANT: SET YOUR API KEY HERE ---
-    OPENWEATHERMAP_API_KEY = "YOUR_OPENWEATHERMAP_API_KEY" 
-    OPENWEATHERMAP_URL = "http://api.openweathermap.org/data/2.5/onecall/timemachine"
-    # ----------------------------------------
+    import orjson
     
     if OPENWEATHERMAP_API_KEY == "YOUR_OPENWEATHERMAP_API_KEY":
         # Return dummy data if API key is not set (for testing purposes)
@@ -61,9 +74,10 @@ def get_historical_weather(lat, lon, dt):
     }
 
     try:
-        response = requests.get(OPENWEATHERMAP_URL, params=params, timeout=5)
+        http = session if session is not None else requests
+        response = http.get(OPENWEATHERMAP_URL, params=params, timeout=5)
         response.raise_for_status() # Raise exception for bad status codes (4xx or 5xx)
-        data = response.json()
+        data = orjson.loads(response.content) # Faster than the stdlib json behind response.json()
         
         # The API returns an hourly block (data['hourly'][0]) for the requested timestamp
         hourly_data = data['hourly'][0]
@@ -83,7 +97,7 @@ def get_historical_weather(lat, lon, dt):
             'match_wind_speed': np.nan,
             'match_dew_point': np.nan
         }
-    except (IndexError, KeyError):
+    except (IndexError, KeyError, orjson.JSONDecodeError):
         print(f"API returned incomplete data for timestamp {dt}. Returning dummy values.")
         return {
             'match_temp': np.nan,
@@ -93,6 +107,62 @@ def get_historical_weather(lat, lon, dt):
         }
 
 
+def load_geo_data(geo_data_path):
+    """
+    Loads the static stadium geo data, caching it as CSV next to the Excel file.
+    
+    Parsing the .xlsx with openpyxl is slow, so the first run writes a CSV copy and
+    later runs read that instead. The cache is rebuilt whenever the Excel file is newer.
+    
+    Parameters:
+    - geo_data_path (str): Path to the stadium geo data Excel file.
+    
+    Returns:
+    - pd.DataFrame: The stadium geo data.
+    """
+    cache_path = geo_data_path + '.csv'
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(geo_data_path):
+        return pd.read_csv(cache_path)
+
+    geo_df = pd.read_excel(geo_data_path)
+    geo_df.to_csv(cache_path, index=False)
+    return geo_df
+
+
+def calculate_inning_scores(deliveries_df):
+    """
+    Sums the runs of every (match_id, inning) pair in a single pass over sorted arrays.
+    
+    Deliveries are normally already ordered by match and inning, so instead of a hash
+    groupby the group boundaries are found where the key changes and the runs between
+    them are summed with np.add.reduceat. The rows are sorted first only if needed.
+    
+    Parameters:
+    - deliveries_df (pd.DataFrame): Ball-by-ball data with 'match_id', 'inning' and 'total_runs'.
+    
+    Returns:
+    - pd.DataFrame: One row per (match_id, inning) with the summed 'inning_score'.
+    """
+    match_ids = deliveries_df['match_id'].to_numpy()
+    innings = deliveries_df['inning'].to_numpy()
+    runs = deliveries_df['total_runs'].to_numpy()
+
+    match_step = np.diff(match_ids)
+    if ((match_step < 0) | ((match_step == 0) & (np.diff(innings) < 0))).any():
+        order = np.lexsort((innings, match_ids))
+        match_ids, innings, runs = match_ids[order], innings[order], runs[order]
+
+    new_group = np.ones(len(runs), dtype=bool)
+    new_group[1:] = (match_ids[1:] != match_ids[:-1]) | (innings[1:] != innings[:-1])
+    group_starts = np.flatnonzero(new_group)
+
+    return pd.DataFrame({
+        'match_id': match_ids[group_starts],
+        'inning': innings[group_starts],
+        'inning_score': np.add.reduceat(runs, group_starts)
+    })
+
+
 def merge_datasets(deliveries_path, matches_path, geo_data_path):
     """
     Loads, cleans, and merges the three provided datasets, adding custom engineered features.
@@ -107,9 +177,15 @@ def merge_datasets(deliveries_path, matches_path, geo_data_path):
         pass 
 
     try:
-        deliveries_df = pd.read_csv(deliveries_path)
-        matches_df = pd.read_csv(matches_path)
-        geo_df = pd.read_excel(geo_data_path)
+        # Only the columns needed for the inning scores are parsed, with the pyarrow reader
+        deliveries_df = pd.read_csv(deliveries_path, engine='pyarrow',
+                                    usecols=['match_id', 'inning', 'total_runs'],
+                                    dtype={'match_id': 'int64', 'inning': 'int8', 'total_runs': 'int32'})
+        # Match columns that are never used are skipped at read time so they are not
+        # carried through the merges
+        unused_match_cols = ['player_of_match', 'result', 'dl_applied', 'umpire1', 'umpire2', 'umpire3']
+        matches_df = pd.read_csv(matches_path, usecols=lambda col: col not in unused_match_cols)
+        geo_df = load_geo_data(geo_data_path)
         print("All datasets loaded successfully.")
 
     except FileNotFoundError as e:
@@ -118,36 +194,69 @@ def merge_datasets(deliveries_path, matches_path, geo_data_path):
 
     # --- Step 1: Calculate Inning Scores and Match Prep ---
     print("\nCalculating inning scores...")
-    inning_scores = deliveries_df.groupby(['match_id', 'inning'])['total_runs'].sum().reset_index()
-    inning_scores.rename(columns={'total_runs': 'inning_score'}, inplace=True)
+    inning_scores = calculate_inning_scores(deliveries_df)
     
+    # inning_scores has one row per (match_id, inning), so the merge can only produce
+    # duplicate (id, inning) rows if a match id is repeated in the matches file
+    if not matches_df['id'].is_unique:
+        matches_df = matches_df.loc[~matches_df['id'].duplicated()]
     merged_df = pd.merge(matches_df, inning_scores, left_on='id', right_on='match_id', how='inner')
-    merged_df.drop_duplicates(subset=['id', 'inning'], keep='first', inplace=True)
     print("Inning scores merged with matches data.")
 
-    # Convert date to datetime for feature engineering
-    merged_df['date'] = pd.to_datetime(merged_df['date'], format='mixed', dayfirst=True)
+    # Convert date to datetime for feature engineering. The matches file mixes ISO dates
+    # with dd/mm/yy ones, so both are parsed with the vectorized fixed-format parser and
+    # only anything left over goes through per-row format inference.
+    # (ISO dates must not be parsed with dayfirst=True, which swaps their day and month.)
+    parsed_dates = pd.to_datetime(merged_df['date'], format='%Y-%m-%d', errors='coerce')
+    unparsed = parsed_dates.isna() & merged_df['date'].notna()
+    parsed_dates[unparsed] = pd.to_datetime(merged_df.loc[unparsed, 'date'], format='%d/%m/%y', errors='coerce')
+    unparsed = parsed_dates.isna() & merged_df['date'].notna()
+    if unparsed.any():
+        parsed_dates[unparsed] = pd.to_datetime(merged_df.loc[unparsed, 'date'], format='mixed', dayfirst=True)
+    merged_df['date'] = parsed_dates
     merged_df['Year'] = merged_df['date'].dt.year
 
     # --- Step 2: Feature Engineering (Pitch Degradation) ---
     print("Engineering dynamic pitch degradation features...")
     
+    # Sort once; both features are then derived from group boundaries in the sorted order
     merged_df = merged_df.sort_values(['venue', 'date'])
-    merged_df['last_match_date'] = merged_df.groupby('venue')['date'].shift(1)
-    merged_df['Days Since Last Match'] = (merged_df['date'] - merged_df['last_match_date']).dt.days
-    merged_df['Days Since Last Match'] = merged_df['Days Since Last Match'].fillna(365)
-    merged_df['Matches This Season'] = merged_df.groupby(['season', 'venue']).cumcount() + 1
+    venues = merged_df['venue'].to_numpy()
+    seasons = merged_df['season'].to_numpy()
+    new_venue = np.ones(len(merged_df), dtype=bool)
+    new_venue[1:] = venues[1:] != venues[:-1]
+
+    merged_df['last_match_date'] = merged_df['date'].shift(1).mask(new_venue)
+    # Day arithmetic on datetime64[D] arrays; the first match at a venue (NaT) gets 365
+    match_days = merged_df['date'].to_numpy(dtype='datetime64[D]')
+    last_match_days = merged_df['last_match_date'].to_numpy(dtype='datetime64[D]')
+    days_since = (match_days - last_match_days).astype(np.int32)
+    merged_df['Days Since Last Match'] = np.where(np.isnat(last_match_days), 365, days_since).astype(np.int32)
+
+    # Within a venue the rows are in date order, so every (season, venue) group is contiguous
+    new_season = new_venue.copy()
+    new_season[1:] |= seasons[1:] != seasons[:-1]
+    positions = np.arange(len(merged_df))
+    season_start = np.maximum.accumulate(np.where(new_season, positions, 0))
+    merged_df['Matches This Season'] = positions - season_start + 1
     print("Dynamic features ('Days Since Last Match', 'Matches This Season') added.")
 
     # --- Step 3: Standardize Venue Names and Merge Static Geo Data ---
     venue_mapping = {
         'Rajiv Gandhi International Stadium, Uppal': 'Rajiv Gandhi International Stadium', 'M. Chinnaswamy Stadium': 'M Chinnaswamy Stadium', 'Holkar Cricket Stadium': 'Holkar Cricket Stadium', 'Maharashtra Cricket Association Stadium': 'Maharashtra Cricket Association Stadium', 'Wankhede Stadium': 'Wankhede Stadium', 'Feroz Shah Kotla Ground': 'Feroz Shah Kotla Ground', 'Eden Gardens': 'Eden Gardens', 'Punjab Cricket Association Stadium, Mohali': 'IS Bindra Stadium', 'Feroz Shah Kotla': 'Feroz Shah Kotla Ground', 'M. A. Chidambaram Stadium': 'M. A. Chidambaram Stadium', 'Sardar Patel Stadium, Motera': 'Sardar Patel Stadium, Motera', 'Himachal Pradesh Cricket Association Stadium': 'Himachal Pradesh Cricket Association Stadium', 'Subrata Roy Sahara Stadium': 'Maharashtra Cricket Association Stadium', 'JSCA International Stadium Complex': 'JSCA International Stadium Complex', 'Barabati Stadium': 'Barabati Stadium', 'Saurashtra Cricket Association Stadium': 'Saurashtra Cricket Association Stadium', 'Shaheed Veer Narayan Singh International Stadium': 'Shaheed Veer Narayan Singh International Stadium', 'Dr. Y.S. Rajasekhara Reddy ACA-VDCA Cricket Stadium': 'Dr. Y.S. Rajasekhara Reddy ACA-VDCA Cricket Stadium', 'ACA-VDCA Stadium': 'Dr. Y.S. Rajasekhara Reddy ACA-VDCA Cricket Stadium', 'M. Chinnaswamy Stadium, Bengaluru': 'M Chinnaswamy Stadium', 'Wankhede Stadium, Mumbai': 'Wankhede Stadium', 'Sheikh Zayed Stadium': 'Sheikh Zayed Cricket Stadium'
     }
-    merged_df['venue'] = merged_df['venue'].map(venue_mapping).fillna(merged_df['venue'])
+    # Rewrite only the (small) set of venue categories instead of every row. Several raw
+    # names map to the same stadium, so the renamed categories are re-factorized and the
+    # row codes remapped onto them.
+    venue = merged_df['venue'].astype('category')
+    category_codes, new_categories = venue.cat.categories.map(lambda c: venue_mapping.get(c, c)).factorize()
+    row_codes = venue.cat.codes.to_numpy()
+    row_codes = np.where(row_codes >= 0, category_codes[row_codes], -1)
+    merged_df['venue'] = pd.Categorical.from_codes(row_codes, categories=new_categories)
     geo_df.rename(columns={'Stadium': 'venue'}, inplace=True)
 
-    # Merge static geo data
-    df = pd.merge(merged_df, geo_df[['venue', 'Year', 'Latitude', 'Longitude']], on=['venue', 'Year'], how='left')
+    # Merge static geo data (all of it at once; Latitude/Longitude are dropped after the API step)
+    df = pd.merge(merged_df, geo_df, on=['venue', 'Year'], how='left')
     
     # --- Step 4: API Integration (Dynamic Weather) ---
     print("Integrating dynamic match-day weather data via simulated API...")
@@ -157,35 +266,69 @@ def merge_datasets(deliveries_path, matches_path, geo_data_path):
 
     # Convert match date/time to UNIX timestamp (required by API)
     # We assume an evening start time (6 PM local time) for T20 matches
-    unique_matches['dt'] = (unique_matches['date'] + pd.Timedelta(hours=18)).astype(int) // 10**9 
+    unique_matches['dt'] = (unique_matches['date'] + pd.Timedelta(hours=18)).to_numpy(dtype='datetime64[s]').astype(np.int64)
 
-    # Prepare lists to collect results
-    match_weather_list = []
-    
-    # Iterate through unique matches and call API
-    for index, row in unique_matches.iterrows():
-        weather_data = get_historical_weather(row['Latitude'], row['Longitude'], row['dt'])
-        weather_data['id'] = row['id']
-        match_weather_list.append(weather_data)
-        # Use time.sleep(1) here to respect API rate limits in a real project!
+    # Matches played at the same stadium on the same day share one API call
+    rows = unique_matches[['id', 'Latitude', 'Longitude', 'dt']].to_records(index=False)
+    weather_keys = [f"{row.Latitude:.3f},{row.Longitude:.3f},{int(row.dt) // 86400}" for row in rows]
+
+    # Reuse responses cached by earlier runs (only real API responses are cached)
+    use_cache = OPENWEATHERMAP_API_KEY != "YOUR_OPENWEATHERMAP_API_KEY"
+    weather_cache = shelve.open(WEATHER_CACHE_PATH) if use_cache else {}
+
+    # Call the API concurrently over a shared keep-alive session
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=WEATHER_MAX_WORKERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
 
-    match_weather_df = pd.DataFrame(match_weather_list)
+    weather_futures = {}
+    with ThreadPoolExecutor(max_workers=WEATHER_MAX_WORKERS) as executor:
+        for key, row in zip(weather_keys, rows):
+            if key not in weather_futures and key not in weather_cache:
+                weather_futures[key] = executor.submit(
+                    get_historical_weather, row.Latitude, row.Longitude, int(row.dt), session)
+        # Use a rate limiter here to respect API rate limits in a real project!
+
+    # Store successful responses, then collect results in match order
+    for key, future in weather_futures.items():
+        weather_data = future.result()
+        if not any(pd.isna(value) for value in weather_data.values()):
+            weather_cache[key] = weather_data
+    session.close()
+
+    # Fill one preallocated array per weather metric instead of building a dict per match
+    weather_columns = ['match_temp', 'match_humidity', 'match_wind_speed', 'match_dew_point']
+    weather_values = {col: np.empty(len(rows)) for col in weather_columns}
+    for i, key in enumerate(weather_keys):
+        weather_data = weather_futures[key].result() if key in weather_futures else weather_cache[key]
+        for col in weather_columns:
+            value = weather_data[col]
+            weather_values[col][i] = np.nan if value is None else value
+    if use_cache:
+        weather_cache.close()
+
+    match_weather_df = pd.DataFrame({'id': rows.id, **weather_values})
     
     # Merge the new dynamic weather data back into the main DataFrame
     final_df = pd.merge(df.drop(columns=['Latitude', 'Longitude']), match_weather_df, on='id', how='left')
-
-    # Re-merge the rest of the static geo data that was initially excluded
-    final_df = pd.merge(final_df, geo_df.drop(columns=['Latitude', 'Longitude']), on=['venue', 'Year'], how='left')
     
     print("Dynamic weather features added successfully.")
 
     # --- Step 5: Final Cleaning and Preparation ---
-    final_df = final_df.drop(columns=['id', 'match_id', 'player_of_match', 'result', 
-                                      'dl_applied', 'umpire1', 'umpire2', 'umpire3', 'last_match_date'])
+    final_df = final_df.drop(columns=['id', 'match_id', 'last_match_date'])
     
-    # Fill any remaining NaN values in numerical columns
-    numeric_cols = final_df.select_dtypes(include=np.number).columns
-    final_df[numeric_cols] = final_df[numeric_cols].fillna(final_df[numeric_cols].mean())
+    # Fill any remaining NaN values in numerical columns with the column mean, in one
+    # NumPy pass (only float columns can hold NaN, so integer columns keep their dtype)
+    numeric_cols = final_df.select_dtypes(include='floating').columns
+    values = final_df[numeric_cols].to_numpy(dtype=np.float64)
+    missing = np.isnan(values)
+    with warnings.catch_warnings():
+        # A column that is entirely NaN (e.g. every API call failed) simply stays NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        column_means = np.nanmean(values, axis=0)
+    values[missing] = np.broadcast_to(column_means, values.shape)[missing]
+    final_df[numeric_cols] = values
 
     print("\nFinal merged DataFrame shape:", final_df.shape)
     print("Final merged DataFrame head:")
@@ -204,6 +347,6 @@ if __name__ == '__main__':
     final_dataset = merge_datasets(deliveries_file, matches_file, geo_file)
     
     if final_dataset is not None:
-        final_dataset.to_csv('final_cricket_dataset.csv', index=False)
-        print("\nFinal dataset saved to 'final_cricket_dataset.csv'.")
+        final_dataset.to_parquet('final_cricket_dataset.parquet', compression='zstd', index=False)
+        print("\nFinal dataset saved to 'final_cricket_dataset.parquet'.")
 
@@ -1,64 +1,80 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.ensemble import HistGradientBoostingRegressor
 import numpy as np
 
 def train_and_evaluate_model(file_path):
     """
-    Loads the final dataset, trains a RandomForestRegressor model, and evaluates its performance.
+    Loads the final dataset, trains a HistGradientBoostingRegressor model, and evaluates its performance.
     
     Parameters:
-    - file_path: Path to the final merged dataset CSV file.
+    - file_path: Path to the final merged dataset Parquet file.
     """
     try:
-        df = pd.read_csv(file_path)
+        df = pd.read_parquet(file_path)
         print("Final dataset loaded successfully.")
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found.")
         print("Please run merge_datasets.py first to create this file.")
         return
         
+    # Downcast numeric columns to halve the memory the model has to stream through
+    float_cols = df.select_dtypes(include='float64').columns
+    df[float_cols] = df[float_cols].astype(np.float32)
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+
     # --- Step 1: Feature Engineering and Data Preparation ---
-    # One-hot encode categorical features
+    # Encode categorical features as pandas categories; the model splits on their
+    # integer codes natively, so no one-hot encoding is needed
     categorical_features = ['toss_winner', 'toss_decision', 'winner', 'venue', 'Country', 
                             'Pitch Soil Type', 'Wind Condition']
-    df = pd.get_dummies(df, columns=categorical_features, drop_first=True)
+    for feature in categorical_features:
+        df[feature] = df[feature].astype('category')
     
     # Drop columns that are no longer needed for training, including 'city'
     # as it is already represented by 'venue'.
     df = df.drop(columns=['team1', 'team2', 'date', 'city'], errors='ignore')
     
-    print("Categorical features have been one-hot encoded.")
+    print("Categorical features have been encoded as categories.")
 
     # --- Step 2: Define Features (X) and Target (y) ---
     X = df.drop('inning_score', axis=1)
     y = df['inning_score']
 
-    # --- Filter out any remaining non-numerical columns from X before training ---
-    X_numerical = X.select_dtypes(include=np.number)
+    # --- Filter out any remaining non-numerical, non-categorical columns from X before training ---
+    X_numerical = X.select_dtypes(include=[np.number, 'category'])
     
     # --- Step 3: Split the Data ---
-    X_train, X_test, y_train, y_test = train_test_split(X_numerical, y, test_size=0.2, random_state=42)
+    # A seeded permutation sliced 80/20; take() keeps the DataFrame so the category
+    # dtypes needed by the model survive the split
+    permutation = np.random.default_rng(42).permutation(len(y))
+    split = int(0.8 * len(y))
+    train_idx, test_idx = permutation[:split], permutation[split:]
+    X_train, X_test = X_numerical.take(train_idx), X_numerical.take(test_idx)
+    y_train, y_test = y.take(train_idx), y.take(test_idx)
     print("Data split into training and testing sets.")
 
     # --- Step 4: Train the Model ---
-    # We use RandomForestRegressor, a powerful model for this type of problem
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    # We use HistGradientBoostingRegressor, which bins the features into histograms
+    # and trains much faster than a random forest on tabular data like this
+    model = HistGradientBoostingRegressor(max_iter=300, max_bins=255, early_stopping=True,
+                                          categorical_features='from_dtype', random_state=42)
     model.fit(X_train, y_train)
     print("Model training complete.")
 
     # --- Step 5: Evaluate the Model ---
     predictions = model.predict(X_test)
     
-    mae = mean_absolute_error(y_test, predictions)
-    rmse = np.sqrt(mean_squared_error(y_test, predictions))
+    # MAE and RMSE from a single residual vector
+    errors = predictions - y_test.to_numpy(dtype=np.float64)
+    mae = np.abs(errors).mean()
+    rmse = np.sqrt((errors * errors).mean())
     
     print("\n--- Model Evaluation ---")
     print(f"Mean Absolute Error (MAE): {mae:.2f}")
     print(f"Root Mean Squared Error (RMSE): {rmse:.2f}")
 
 if __name__ == '__main__':
-    train_and_evaluate_model('final_cricket_dataset.csv')
+    train_and_evaluate_model('final_cricket_dataset.parquet')
 
 